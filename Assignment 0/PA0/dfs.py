@@ -12,7 +12,9 @@
 # Psalm Bautista - 9/15/23
 
 
+import vars
 from route import Node
+from route import SearchContext
 from route import Frontier
 
 
@@ -24,19 +26,23 @@ def DFS(problem, repeat_check=False):
 
     # PLACE YOUR CODE HERE
     parent = Node(problem.start)
-    if problem.is_goal(parent):
+    if problem.is_goal(parent.loc):
         return parent
-    visited = [parent]
+    visited = {parent.loc}
     stack = Frontier(parent, True)
-    while not stack.is_empty():
-        branch = stack.pop()
-        if problem.is_goal(branch.loc):
-            return branch
-        for node in branch.expand(problem):
-            if repeat_check:
-                if node not in visited:
-                    visited.append(node)
+    ctx = SearchContext()
+    try:
+        while not stack.is_empty():
+            branch = stack.pop()
+            if problem.is_goal(branch.loc):
+                return branch
+            for node in branch.expand(problem, ctx):
+                if repeat_check:
+                    if node.loc not in visited:
+                        visited.add(node.loc)
+                        stack.add(node)
+                else:
                     stack.add(node)
-            else:
-                stack.add(node)
-    return None
+        return None
+    finally:
+        vars.nodes_expanded_count += ctx.expansions
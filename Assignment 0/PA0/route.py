@@ -7,12 +7,15 @@
 #   * RoadMap - encodes a graph containing locations and road segments
 #   * RouteProblem - a formal search problem
 #   * Node - a search tree node
+#   * SearchContext - state kept for the duration of a single search
 #   * Frontier - the fringe of a search tree, implemented as either a
 #                queue or a stack
 # Each class includes relevant methods for the given objects.
 #
 # The script also uses a global node expansion counter and a search
 # depth limit, with the latter parameter used to stop infinite loops.
+# During a search, expansions are counted in a SearchContext, and the
+# search function adds the total to the global counter when it finishes.
 #
 # The contents of this file are based on code assembled for the book
 # "Artificial Intelligence: A Modern Approach" by Stuart Russell and
@@ -42,6 +45,9 @@ class RoadMap:
         self.road_dict = road_dict or {}
         # Cartesian coordinates of locations
         self.loc_dict = loc_dict or {}
+        # tuples of road segment names leading from each location, filled
+        # in as they are needed and cleared when a road is added
+        self._road_names = {}
 
     def add_location(self, loc, longitude, latitude):
         """Add a location with the given y and x coordinates."""
@@ -52,11 +58,21 @@ class RoadMap:
         self.connection_dict.setdefault(start, {})[end] = cost
         if name is not None:
             self.road_dict.setdefault(start, {})[name] = end
+            self._road_names.pop(start, None)
+
+    def road_names(self, start):
+        """Return a tuple of the names of the road segments leading from
+        the given location."""
+        names = self._road_names.get(start)
+        if names is None:
+            names = tuple(self.road_dict.get(start, {}))
+            self._road_names[start] = names
+        return names
 
     def get(self, start, end=None):
         """Return the road cost from start to end. If end is not given,
         return a dict containing {end location: cost} entries."""
-        successors = self.connection_dict.setdefault(start, {})
+        successors = self.connection_dict.get(start, {})
         if end is None:
             return successors
         else:
@@ -66,7 +82,7 @@ class RoadMap:
         """Return the resulting location name when starting in the given
         location and taking the given road segment. If the road is not
         specified, return a dict with {road name: location} entries."""
-        successors = self.road_dict.setdefault(start, {})
+        successors = self.road_dict.get(start, {})
         if road is None:
             return successors
         else:
@@ -83,7 +99,7 @@ class RouteProblem:
 
     def actions(self, loc):
         """Return the road segment names leading from the given location."""
-        return self.map.get_result(loc).keys()
+        return self.map.road_names(loc)
 
     def result(self, loc, road):
         """Return the location at the end of the given road, starting at
@@ -99,6 +115,17 @@ class RouteProblem:
         return self.map.get(start, end)
 
 
+class SearchContext:
+    """State kept for the duration of a single search, and shared with
+    the nodes expanded during that search."""
+
+    __slots__ = ('expansions',)
+
+    def __init__(self):
+        # number of nodes expanded so far in this search
+        self.expansions = 0
+
+
 class Node:
     """A node in the search tree for a route finding problem."""
 
@@ -127,10 +154,14 @@ class Node:
         end_node = Node(child_loc, self, road, child_cost)
         return end_node
 
-    def expand(self, problem):
+    def expand(self, problem, ctx=None):
         """Return a list of the nodes reachable via a single road segment
-        from this node."""
-        vars.nodes_expanded_count += 1
+        from this node. The expansion is counted in the given search
+        context or, if none is given, in the global counter."""
+        if ctx is None:
+            vars.nodes_expanded_count += 1
+        else:
+            ctx.expansions += 1
         if self.depth >= depth_limit:
             # Return no children if at the depth limit ...
             return []
@@ -174,16 +205,6 @@ class Node:
             this_node = this_node.parent
         return list(reversed(backwards_path))
 
-    def __eq__(self, other):
-        # For the purposes of checking if a node is in a list, nodes are
-        # considered equal if they have the same location.
-        return isinstance(other, Node) and self.loc == other.loc
-
-    def __hash__(self):
-        # For the purposes of comparing nodes in a hash table, the hash
-        # code for the corresponding location should be used.
-        return hash(self.loc)
-
 
 class Frontier:
     """A list of the nodes in the fringe of a search tree, implemented
@@ -207,16 +228,17 @@ class Frontier:
     def contains(self, query_node):
         """Return True if and only if there is a node in the frontier with
         the same location as the query node."""
-        return query_node in self.nodes
+        return any(n.loc == query_node.loc for n in self.nodes)
 
-    def add(self, new_nodes):
-        """Add the given node (or nodes) to the frontier."""
-        if isinstance(new_nodes, list):
-            # Add the nodes in "new_nodes" to the end of the "nodes" list.
-            self.nodes.extend(new_nodes)
-        else:
-            # Add the given single node to the end of the "nodes" list.
-            self.nodes.append(new_nodes)
+    def add(self, new_node):
+        """Add the given node to the frontier."""
+        # Add the given single node to the end of the "nodes" list.
+        self.nodes.append(new_node)
+
+    def add_many(self, new_nodes):
+        """Add each of the given nodes to the frontier."""
+        # Add the nodes in "new_nodes" to the end of the "nodes" list.
+        self.nodes.extend(new_nodes)
 
     def pop(self):
         """Remove the next node from the frontier, returning it."""
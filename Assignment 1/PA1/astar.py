@@ -12,7 +12,12 @@
 # Psalm Bautista 10/18/2023
 
 
+import heapq
+import math
+import route
+import vars
 from route import Node
+from route import SearchContext
 from route import Frontier
 
 
@@ -23,27 +28,137 @@ def a_star_search(problem, h, repeat_check=False):
     the provided boolean argument is true."""
 
     # PLACE YOUR CODE HERE
+    # Use the compiled search, with no Node objects during search, when
+    # the heuristic provides values indexed by the location numbers of the
+    # problem's current compiled map.
+    if (getattr(h, 'compiled', None) is problem.compiled
+            and problem.start_id >= 0):
+        return compiled_a_star_search(problem, h, repeat_check)
+
     node = Node(problem.start, h_fun=h)
     if problem.is_goal(node.loc):
         return node
 
     frontier = Frontier(node, "f")
-    reachedNodes = [node]
+    best_cost = {node.loc: frontier.key(node)}
 
-    while not frontier.is_empty():
-        node = frontier.pop()
-        if problem.is_goal(node.loc):
-            return node
-        for child in node.expand(problem):
-            if repeat_check:
-                if child in reachedNodes:
-                    if frontier.contains(child) and frontier[child] > frontier.__getitem__(child):
-                        frontier.__delitem__(child)
+    ctx = SearchContext()
+    try:
+        while not frontier.is_empty():
+            node = frontier.pop()
+            if problem.is_goal(node.loc):
+                return node
+            for child in node.expand(problem, h, ctx):
+                if repeat_check:
+                    value = frontier.key(child)
+                    if child.loc in best_cost:
+                        if (value < best_cost[child.loc]
+                                and frontier.contains(child)):
+                            del frontier[child]
+                            frontier.add(child)
+                            best_cost[child.loc] = value
+                    else:
                         frontier.add(child)
+                        best_cost[child.loc] = value
                 else:
                     frontier.add(child)
-                    reachedNodes.append(child)
-            else:
-                frontier.add(child)
 
-    return None
+        return None
+    finally:
+        vars.node_expansion_count += ctx.expansions
+
+
+def compiled_a_star_search(problem, h, repeat_check=False):
+    """Perform A-Star search like a_star_search, but over a compiled form
+    of the road map. Locations are numbered, and search tree nodes are
+    numbered as they are generated, with each node field kept in its own
+    list indexed by node number instead of in a Node object. Node objects
+    are only created for the solution path once the goal is reached. The
+    heuristic function must provide a table of values indexed by location
+    number in the problem's compiled map, as HeuristicFunction does.
+    Only perform repeated state checking if the provided boolean argument
+    is true."""
+    cmap = problem.compiled
+    start = problem.start_id
+    if start < 0:
+        # a start location that is not on the map has no successors
+        return None
+    h_eval = h.h_table
+    (solution, expansions, node_loc, node_parent, node_road, node_g) = \
+        search_ids(start, problem.goal_id, cmap.adj_start, cmap.adj_end,
+                   cmap.adj_cost, h_eval, route.depth_limit, repeat_check)
+    vars.node_expansion_count += expansions
+    if solution < 0:
+        return None
+    steps = []
+    k = solution
+    while k > 0:
+        steps.append(k)
+        k = node_parent[k]
+    node = Node(problem.start, h_eval=h_eval[start], h_fun=h)
+    for k in reversed(steps):
+        i = node_loc[k]
+        node = Node(cmap.locs[i], node, cmap.adj_road[node_road[k]],
+                    node_g[k], h_eval[i], h)
+    return node
+
+
+def search_ids(start, goal, adj_start, adj_end, adj_cost, h_eval,
+               depth_limit, repeat_check):
+    """The search loop of compiled_a_star_search, using only location
+    numbers and flat lists. Return
+    the number of the solution node (or -1), the number of node
+    expansions, and the location, parent, road segment, and path cost
+    lists of the search tree nodes."""
+    n = len(h_eval)
+
+    # search tree nodes: location, parent node, road segment taken from
+    # the parent, path cost, and depth (lists grow as nodes are created)
+    node_loc = [start]
+    node_parent = [-1]
+    node_road = [-1]
+    node_g = [0.0]
+    node_depth = [0]
+
+    # for repeated state checking, the best path cost found to each
+    # location and the node for it still in the frontier (or -1)
+    best_g = [math.inf] * n
+    best_g[start] = 0.0
+    open_node = [-1] * n
+    open_node[start] = 0
+
+    fringe = [(h_eval[start], 0)]
+    expansions = 0
+    solution = -1
+
+    while fringe:
+        (_, k) = heapq.heappop(fringe)
+        i = node_loc[k]
+        if repeat_check:
+            if open_node[i] != k:
+                # a cheaper path to this location was found after this node
+                continue
+            open_node[i] = -1
+        if i == goal:
+            solution = k
+            break
+        expansions += 1
+        if node_depth[k] >= depth_limit:
+            continue
+        for e in range(adj_start[i], adj_start[i + 1]):
+            j = adj_end[e]
+            cost = node_g[k] + adj_cost[e]
+            if repeat_check:
+                if best_g[j] < math.inf:
+                    if not (cost < best_g[j] and open_node[j] >= 0):
+                        continue
+                best_g[j] = cost
+                open_node[j] = len(node_loc)
+            heapq.heappush(fringe, (cost + h_eval[j], len(node_loc)))
+            node_loc.append(j)
+            node_parent.append(k)
+            node_road.append(e)
+            node_g.append(cost)
+            node_depth.append(node_depth[k] + 1)
+
+    return solution, expansions, node_loc, node_parent, node_road, node_g
@@ -13,7 +13,9 @@
 # Psalm Bautista 10/18/2023
 
 
+import vars
 from route import Node
+from route import SearchContext
 from route import Frontier
 
 
@@ -29,17 +31,21 @@ def greedy_search(problem, h, repeat_check=False):
         return node
 
     frontier = Frontier(node, "h")
-    reachedNodes = [node]
+    reachedNodes = {node.loc}
 
-    while not frontier.is_empty():
-        node = frontier.pop()
-        if problem.is_goal(node.loc):
-            return node
-        for child in node.expand(problem):
-            if repeat_check:
-                if child not in reachedNodes:
+    ctx = SearchContext()
+    try:
+        while not frontier.is_empty():
+            node = frontier.pop()
+            if problem.is_goal(node.loc):
+                return node
+            for child in node.expand(problem, h, ctx):
+                if repeat_check:
+                    if child.loc not in reachedNodes:
+                        frontier.add(child)
+                        reachedNodes.add(child.loc)
+                else:
                     frontier.add(child)
-                    reachedNodes.append(child)
-            else:
-                frontier.add(child)
-    return None
+        return None
+    finally:
+        vars.node_expansion_count += ctx.expansions
@@ -16,6 +16,7 @@
 # Psalm Bautista 10/18/2023
 
 
+import math
 import route
 
 
@@ -31,14 +32,27 @@ class HeuristicFunction:
         self.goal = problem.goal
         self.map = problem.map
 
-        self.gasConsumption = []
-        for location in self.map.loc_dict:
-            for connection in self.map.connection_dict[location]:
+        # the best distance covered per unit of cost over all road segments
+        self.efficientGas = 0.0
+        for location, connections in self.map.connection_dict.items():
+            for connection, cost in connections.items():
                 distance = self.map.euclidean_distance(location, connection)
-                gas = distance/self.map.get(location, connection)
-                if gas not in self.gasConsumption:
-                    self.gasConsumption.append(gas)
-        self.efficientGas = max(self.gasConsumption)
+                gas = distance/cost
+                if gas > self.efficientGas:
+                    self.efficientGas = gas
+
+        # heuristic values for every location, computed in one pass over
+        # the coordinates of the compiled map, indexed by location number
+        # and by location name; the compiled map is kept, since location
+        # numbers change if the map is recompiled
+        self.compiled = problem.compiled
+        (gx, gy) = self.map.loc_dict[self.goal]
+        self.h_table = [math.hypot(x - gx, y - gy)/self.efficientGas
+                        for (x, y) in self.compiled.xy]
+        self.h_by_name = {loc: self.h_table[i]
+                          for loc, i in self.compiled.loc_ids.items()}
+        # the largest heuristic value, bounding node values during search
+        self.h_max = max(self.h_table, default=0.0)
 
     def h_cost(self, loc=None):
         """An admissible heuristic function, estimating the cost from
@@ -49,6 +63,8 @@ class HeuristicFunction:
             return value
         else:
             # PLACE YOUR CODE FOR CALCULATING value OF loc HERE
+            if loc in self.h_by_name:
+                return self.h_by_name[loc]
             distance = self.map.euclidean_distance(loc, self.goal)
             value = distance/self.efficientGas
             return value
@@ -5,14 +5,20 @@
 # implementation of route-finding heuristic search algorithms. In particular,
 # the file defines the following classes:
 #   * RoadMap - encodes a graph containing locations and road segments
+#   * CompiledMap - a RoadMap flattened into integer-indexed arrays
 #   * RouteProblem - a formal search problem
 #   * Node - a search tree node
+#   * SearchContext - state kept for the duration of a single search
 #   * Frontier - the fringe of a search tree, implemented as a priority
 #                queue sorted by one of three common node metrics
+#   * BucketFrontier - a Frontier whose priority queue is divided into
+#                      buckets over a known range of node values
 # Each class includes relevant methods for the given objects.
 #
 # The script also uses a global node expansion counter and a search
 # depth limit, with the latter parameter used to stop infinite loops.
+# During a search, expansions are counted in a SearchContext, and the
+# search function adds the total to the global counter when it finishes.
 #
 # The contents of this file are based on code assembled for the book
 # "Artificial Intelligence: A Modern Approach" by Stuart Russell and
@@ -24,12 +30,28 @@
 
 import heapq
 import math
+import operator
+import sys
 import vars
 
 
 # Search depth limit, to avoid infinite loops ...
 depth_limit = 20
 
+# Largest number of buckets a BucketFrontier is given, so that tiny road
+# costs or a large depth limit do not allocate huge bucket lists ...
+max_buckets = 10000
+
+# Bound once, since distances are computed inside the search loop ...
+_hypot = math.hypot
+
+
+def intern(name):
+    """Return the interned copy of the given location or road name, so
+    that comparing and hashing names during search is as cheap as
+    possible. Names that are not strings are returned unchanged."""
+    return sys.intern(name) if type(name) is str else name
+
 
 class RoadMap:
     """A road map contains locations on a Cartesian plane and directed
@@ -38,21 +60,59 @@ class RoadMap:
 
     def __init__(self, connection_dict=None, road_dict=None, loc_dict=None):
         # road segment costs indexed by start and end locations
-        self.connection_dict = connection_dict or {}
+        self.connection_dict = {
+            intern(start): {intern(end): cost for end, cost in ends.items()}
+            for start, ends in (connection_dict or {}).items()}
         # mapping from location and road segment to resulting location
-        self.road_dict = road_dict or {}
+        self.road_dict = {
+            intern(start): {intern(road): intern(end)
+                            for road, end in roads.items()}
+            for start, roads in (road_dict or {}).items()}
         # Cartesian coordinates of locations
-        self.loc_dict = loc_dict or {}
+        self.loc_dict = {intern(loc): xy
+                         for loc, xy in (loc_dict or {}).items()}
+        # distances already computed, indexed by location pairs in both
+        # orders, since distance is symmetric
+        self._dist_cache = {}
+        # tuples of road segment names leading from each location, filled
+        # in as they are needed and cleared when a road is added
+        self._road_names = {}
+        # compiled form of the map, built by finalize when first needed
+        self._compiled = None
 
     def add_location(self, loc, longitude, latitude):
         """Add a location with the given y and x coordinates."""
-        self.loc_dict[loc] = (longitude, latitude)
+        self.loc_dict[intern(loc)] = (longitude, latitude)
+        self._dist_cache.clear()
+        self._compiled = None
 
     def add_road(self, start, end, name=None, cost=1.0):
         """Add a road from start to end with the given cost."""
+        start = intern(start)
+        end = intern(end)
         self.connection_dict.setdefault(start, {})[end] = cost
         if name is not None:
-            self.road_dict.setdefault(start, {})[name] = end
+            self.road_dict.setdefault(start, {})[intern(name)] = end
+            self._road_names.pop(start, None)
+        self._compiled = None
+
+    def finalize(self):
+        """Return the CompiledMap for this map, building it the first time
+        it is needed. Adding a location or road through this object causes
+        it to be rebuilt, but changes made directly to the underlying dicts
+        after this call are not seen."""
+        if self._compiled is None:
+            self._compiled = compile_map(self)
+        return self._compiled
+
+    def road_names(self, start):
+        """Return a tuple of the names of the road segments leading from
+        the given location."""
+        names = self._road_names.get(start)
+        if names is None:
+            names = tuple(self.road_dict.get(start, {}))
+            self._road_names[start] = names
+        return names
 
     def locations(self):
         """Return a list of all of the locations on the map."""
@@ -61,7 +121,7 @@ class RoadMap:
     def get(self, start, end=None):
         """Return the road cost from start to end. If end is not given,
         return a dict containing {location: cost} entries."""
-        successors = self.connection_dict.setdefault(start, {})
+        successors = self.connection_dict.get(start, {})
         if end is None:
             return successors
         else:
@@ -71,7 +131,7 @@ class RoadMap:
         """Return the resulting location name when starting in the given
         location and taking the given road segment. If the road is not
         specified, return a dict with {road name: location} entries."""
-        successors = self.road_dict.setdefault(start, {})
+        successors = self.road_dict.get(start, {})
         if road is None:
             return successors
         else:
@@ -99,16 +159,77 @@ class RoadMap:
 
     def location_coordinates(self, loc):
         """Return the coordinates of the given location in the map."""
-        (x, y) = self.loc_dict.setdefault(loc, (0.0, 0.0))
-        if x and y:
-            return x, y
-        else:
-            raise Exception("Unknown location - " + loc)
+        try:
+            return self.loc_dict[loc]
+        except KeyError:
+            raise KeyError("Unknown location - " + str(loc))
 
     def euclidean_distance(self, loc0, loc1):
-        (x0, y0) = self.location_coordinates(loc0)
-        (x1, y1) = self.location_coordinates(loc1)
-        return math.sqrt(((x0 - x1) * (x0 - x1)) + ((y0 - y1) * (y0 - y1)))
+        key = (loc0, loc1)
+        if key in self._dist_cache:
+            return self._dist_cache[key]
+        try:
+            (x0, y0) = self.loc_dict[loc0]
+            (x1, y1) = self.loc_dict[loc1]
+        except KeyError as e:
+            raise KeyError("Unknown location - " + str(e.args[0]))
+        distance = _hypot(x0 - x1, y0 - y1)
+        self._dist_cache[key] = distance
+        self._dist_cache[(loc1, loc0)] = distance
+        return distance
+
+
+class CompiledMap:
+    """A road map flattened into parallel arrays, with locations numbered
+    from zero. The road segments leaving location i are stored at indices
+    adj_start[i] through adj_start[i + 1] - 1 of the adjacency arrays."""
+
+    def __init__(self, locs, loc_ids, xy, adj_start, adj_end, adj_cost,
+                 adj_road, min_cost, max_cost):
+        # location names indexed by location number, and the reverse
+        self.locs = locs
+        self.loc_ids = loc_ids
+        # coordinates indexed by location number (None if not known)
+        self.xy = xy
+        # road segments: resulting location number, cost, and name
+        self.adj_start = adj_start
+        self.adj_end = adj_end
+        self.adj_cost = adj_cost
+        self.adj_road = adj_road
+        # smallest and largest road segment costs on the whole map (None
+        # if the map has no road segments)
+        self.min_cost = min_cost
+        self.max_cost = max_cost
+
+
+def compile_map(roadmap):
+    """Return a CompiledMap for the given RoadMap. Only named road
+    segments are included, as these are the actions of a RouteProblem."""
+    locs = list(roadmap.loc_dict)
+    seen = set(locs)
+    for start, roads in roadmap.road_dict.items():
+        for end in [start] + list(roads.values()):
+            if end not in seen:
+                seen.add(end)
+                locs.append(end)
+    loc_ids = {loc: i for i, loc in enumerate(locs)}
+    xy = [roadmap.loc_dict.get(loc) for loc in locs]
+    adj_start = [0]
+    adj_end = []
+    adj_cost = []
+    adj_road = []
+    for loc in locs:
+        for road, end in roadmap.road_dict.get(loc, {}).items():
+            adj_end.append(loc_ids[end])
+            adj_cost.append(roadmap.connection_dict[loc][end])
+            adj_road.append(road)
+        adj_start.append(len(adj_end))
+    costs = [cost for connections in roadmap.connection_dict.values()
+             for cost in connections.values()]
+    return CompiledMap(locs, loc_ids, xy, adj_start, adj_end, adj_cost,
+                       adj_road, min(costs, default=None),
+                       max(costs, default=None))
+
 
 class RouteProblem:
     """A description of a route finding problem on a given map."""
@@ -117,10 +238,30 @@ class RouteProblem:
         self.map = roadmap
         self.start = start
         self.goal = goal
+        # Compile the map now, so that searches over location numbers only
+        # translate names at the start and end of the search.
+        roadmap.finalize()
+
+    @property
+    def compiled(self):
+        """The CompiledMap for the current state of the road map."""
+        return self.map.finalize()
+
+    @property
+    def start_id(self):
+        """The number of the start location in the compiled map (or -1 if
+        it is not on the map)."""
+        return self.compiled.loc_ids.get(self.start, -1)
+
+    @property
+    def goal_id(self):
+        """The number of the goal location in the compiled map (or -1 if
+        it is not on the map)."""
+        return self.compiled.loc_ids.get(self.goal, -1)
 
     def actions(self, loc):
         """Return the road segment names leading from the given location."""
-        return self.map.get_result(loc).keys()
+        return self.map.road_names(loc)
 
     def result(self, loc, road):
         """Return the location at the end of the given road, starting at
@@ -136,9 +277,23 @@ class RouteProblem:
         return self.map.get(start, end)
 
 
+class SearchContext:
+    """State kept for the duration of a single search, and shared with
+    the nodes expanded during that search."""
+
+    __slots__ = ('expansions',)
+
+    def __init__(self):
+        # number of nodes expanded so far in this search
+        self.expansions = 0
+
+
 class Node:
     """A node in the search tree for a route finding problem."""
 
+    __slots__ = ('loc', 'parent', 'road', 'path_cost', 'h_eval', 'f_eval',
+                 'h_fun', 'depth')
+
     def __init__(self, loc, parent=None, road=None, path_cost=0.0, h_eval=0.0, h_fun=None):
         """Create a search tree Node, derived from a parent and a specified
         road segment (action)."""
@@ -147,6 +302,8 @@ class Node:
         self.road = road
         self.path_cost = path_cost
         self.h_eval = h_eval
+        # computed once, as it is needed every time the node is queued
+        self.f_eval = path_cost + h_eval
         self.h_fun = h_fun
         self.depth = 0
         if parent:
@@ -164,51 +321,50 @@ class Node:
         elif sort_by == 'h':
             return self.h_eval
         elif sort_by == 'f':
-            return self.path_cost + self.h_eval
+            return self.f_eval
         else:
             return 0.0
 
     def child_node(self, problem, road, h_fun=None):
         """Return a node which is a child of the current node (self) via
-        the given road segment."""
+        the given road segment, evaluated using the given heuristic
+        function (if any)."""
         child_loc = problem.result(self.loc, road)
         child_cost = self.path_cost + problem.action_cost(self.loc, child_loc)
-        # If a heuristic function is provided as an argument, then use it.
-        # Otherwise, use the heuristic function of the parent.
-        if h_fun is None:
-            if self.h_fun is None:
-                child_h_fun = None
-            else:
-                child_h_fun = self.h_fun
-        else:
-            child_h_fun = h_fun
-        if child_h_fun is not None:
-            child_eval = child_h_fun.h_cost(child_loc)
-        else:
-            child_eval = 0.0
-        end_node = Node(child_loc, self, road, child_cost, child_eval, child_h_fun)
-        return end_node
+        return Node(child_loc, self, road, child_cost,
+                    h_fun.h_cost(child_loc) if h_fun is not None else 0.0,
+                    h_fun)
 
-    def expand(self, problem):
+    def expand(self, problem, h_fun=None, ctx=None):
         """Return a list of the nodes reachable via a single road segment
-        from this node."""
-        vars.node_expansion_count += 1
+        from this node. The children are evaluated using the given
+        heuristic function or, if none is given, the heuristic function
+        of this node. The expansion is counted in the given search
+        context or, if none is given, in the global counter."""
+        if ctx is None:
+            vars.node_expansion_count += 1
+        else:
+            ctx.expansions += 1
         if self.depth >= depth_limit:
             # Return no children if at the depth limit ...
             return []
         else:
-            return [self.child_node(problem, road)
+            if h_fun is None:
+                h_fun = self.h_fun
+            return [self.child_node(problem, road, h_fun)
                     for road in problem.actions(self.loc)]
 
     def path(self):
         """Return a list of nodes forming the path from the search tree root
         to this node."""
+        path = [None] * (self.depth + 1)
         this_node = self
-        backwards_path = []
-        while this_node:
-            backwards_path.append(this_node)
+        i = self.depth
+        while this_node is not None:
+            path[i] = this_node
             this_node = this_node.parent
-        return list(reversed(backwards_path))
+            i -= 1
+        return path
 
     def solution(self):
         """Return the sequence of road segments from the root of the search
@@ -219,92 +375,217 @@ class Node:
         """Return a list of tuples, each consisting of a road name and the
         resulting location name, corresponding to the path from the search
         tree root to this node."""
+        path = [None] * (self.depth + 1)
         this_node = self
-        backwards_path = []
-        while this_node:
-            backwards_path.append((this_node.road, this_node.loc))
+        i = self.depth
+        while this_node is not None:
+            path[i] = (this_node.road, this_node.loc)
             this_node = this_node.parent
-        return list(reversed(backwards_path))
+            i -= 1
+        return path
+
+
+# Functions giving the value of a node for each cost metric ...
+sort_keys = {'g': operator.attrgetter('path_cost'),
+             'h': operator.attrgetter('h_eval'),
+             'f': operator.attrgetter('f_eval')}
+
+
+def zero_key(node):
+    """Give every node the same value, for unknown cost metrics."""
+    return 0.0
 
-    def __eq__(self, other):
-        # For the purposes of checking if a node is in a list, nodes are
-        # considered equal if they have the same location.
-        return isinstance(other, Node) and self.loc == other.loc
 
-    def __hash__(self):
-        # For the purposes of comparing nodes in a hash table, the hash
-        # code for the corresponding location should be used.
-        return hash(self.loc)
+def location_of(query):
+    """Return the location of the given query, which may be either a Node
+    or a location name."""
+    return query.loc if isinstance(query, Node) else query
 
 
 class Frontier:
     """A list of the nodes in the fringe of a search tree, implemented
     as a priority queue using one of three common cost metrics."""
 
+    __slots__ = ('sort_by', 'key', 'fringe', 'index', 'counter', 'size')
+
     def __init__(self, root_node, sort_by='g'):
         """Create a frontier which is a priority queue sorted by the
         specified cost metric (g, h, or f). The frontier is initialized to
         contain the given root node the search tree."""
         self.sort_by = sort_by
-        self.fringe = [(root_node.value(sort_by), root_node)]
-        heapq.heapify(self.fringe)
+        # the function giving the value of a node, chosen once here rather
+        # than every time a node is added
+        self.key = sort_keys.get(sort_by, zero_key)
+        # Each heap entry is a list of the form [value, count, node, valid].
+        # Ties between equal values are broken by the order in which nodes
+        # were added, so nodes are never compared. Deleted entries are only
+        # marked as invalid, and they are discarded when they reach the top
+        # of the heap.
+        self.fringe = []
+        # The heap entries for each location, in insertion order, so that
+        # queries by location do not need to scan the whole heap.
+        self.index = {}
+        self.counter = 0
+        # number of valid entries in the heap
+        self.size = 0
+        self.add(root_node)
 
     def __len__(self):
         """Return the size of the priority queue."""
-        return len(self.fringe)
+        return self.size
 
     def __contains__(self, query):
         """Returns True if and only if there is a node in the priority
-        queue that matches the given query node."""
+        queue that matches the given query node or location."""
         # This supports the use of the "in" operator. If "f" is a
         # Frontier and "n" is a Node, the conditional test "(n in f)"
         # will be True if and only if there is a Node in "f" with the
-        # same location as "n".
-        return any([n == query for _, n in self.fringe])
+        # same location as "n". A location name may be given instead.
+        return location_of(query) in self.index
 
     def __getitem__(self, query):
         """Returns the cost metric value for a node in the priority queue
-        that matches the given query node."""
+        that matches the given query node or location."""
         # This supports checking the value of a Node in a Frontier. If
         # "f" is a Frontier and "n" is a Node, then "f[n]" will be the
         # value of the first Node in "f" that has the same location as "n".
-        for value, n in self.fringe:
-            if n == query:
-                return value
-        raise KeyError(str(query) + " is not in the frontier.")
+        try:
+            return self.index[location_of(query)][0][0]
+        except KeyError:
+            raise KeyError(str(query) + " is not in the frontier.")
 
     def __delitem__(self, query):
         """Delete the first node in the priority queue that matches the
-        given query node."""
+        given query node or location."""
         # This supports the use of the "del" operator to remove a Node
         # from a Frontier. If "f" is a Frontier and "n" is a Node, then the
         # command "del f[n]" will remove the first Node with a location that
         # matches "n" from "f".
         try:
-            del self.fringe[[n == query for _, n in self.fringe].index(True)]
-        except ValueError:
+            entry = self.index[location_of(query)][0]
+        except KeyError:
             raise KeyError(str(query) + " is not in the frontier.")
-        heapq.heapify(self.fringe)
+        self.forget(entry)
+        entry[-1] = False
 
     def is_empty(self):
-        return len(self.fringe) == 0
+        return self.size == 0
 
     def contains(self, query):
         """Return True if and only if there is a node in the frontier with
-        the same location as the query node."""
+        the same location as the query node (or at the query location)."""
         return query in self
 
-    def add(self, nodes):
-        """Add the given node (or nodes) to the frontier."""
-        if isinstance(nodes, list):
-            for n in nodes:
-                heapq.heappush(self.fringe, (n.value(self.sort_by), n))
-        else:
-            heapq.heappush(self.fringe, (nodes.value(self.sort_by), nodes))
+    def add(self, node):
+        """Add the given node to the frontier."""
+        entry = [self.key(node), self.counter, node, True]
+        self.counter += 1
+        self.size += 1
+        self.insert(entry)
+        self.index.setdefault(node.loc, []).append(entry)
+
+    def insert(self, entry):
+        """Place the given entry in the priority queue."""
+        heapq.heappush(self.fringe, entry)
+
+    def take(self):
+        """Remove and return the entry with the lowest value in the
+        priority queue, valid or not, or None if the queue is empty."""
+        if self.fringe:
+            return heapq.heappop(self.fringe)
+        return None
+
+    def forget(self, entry):
+        """Remove the given heap entry from the location index, leaving
+        one fewer valid entry in the frontier."""
+        self.size -= 1
+        loc = entry[2].loc
+        loc_entries = self.index[loc]
+        loc_entries.remove(entry)
+        if not loc_entries:
+            del self.index[loc]
+
+    def add_many(self, nodes):
+        """Add each of the given nodes to the frontier."""
+        for n in nodes:
+            self.add(n)
 
     def pop(self):
         """Remove the next node from the frontier, returning it."""
-        if self.fringe:
-            return heapq.heappop(self.fringe)[1]
-        else:
-            raise Exception("Trying to pop from an empty frontier.")
+        entry = self.take()
+        while entry is not None:
+            if entry[-1]:
+                self.forget(entry)
+                return entry[2]
+            entry = self.take()
+        raise Exception("Trying to pop from an empty frontier.")
+
+
+class BucketFrontier(Frontier):
+    """A frontier whose priority queue is divided into buckets, each
+    covering a fixed-width range of values between known bounds. A cursor
+    marks the lowest bucket that might be non-empty, and it only moves
+    forward, which suits searches in which node values never decrease,
+    such as uniform cost search and A* search with a consistent
+    heuristic."""
+
+    __slots__ = ('f_min', 'width', 'buckets', 'current_bucket')
+
+    def __init__(self, root_node, sort_by='g', f_min=0.0, f_max=0.0,
+                 width=1.0):
+        """Create a frontier sorted by the specified cost metric, with
+        buckets of the given width covering values from f_min to f_max.
+        The frontier is initialized to contain the given root node of the
+        search tree."""
+        self.f_min = f_min
+        self.width = width
+        self.buckets = [[] for _ in range(int((f_max - f_min) / width) + 1)]
+        self.current_bucket = 0
+        Frontier.__init__(self, root_node, sort_by)
+
+    def insert(self, entry):
+        """Place the given entry in the bucket for its value."""
+        # Values past either end of the range go in the nearest usable
+        # bucket. Each bucket is a small heap, so the lowest value in the
+        # current bucket is always the lowest value in the frontier.
+        b = int((entry[0] - self.f_min) / self.width)
+        if b < self.current_bucket:
+            b = self.current_bucket
+        elif b >= len(self.buckets):
+            b = len(self.buckets) - 1
+        heapq.heappush(self.buckets[b], entry)
+
+    def take(self):
+        """Remove and return the entry with the lowest value, moving the
+        cursor past any empty buckets, or None if all buckets are empty."""
+        while self.current_bucket < len(self.buckets):
+            bucket = self.buckets[self.current_bucket]
+            if bucket:
+                return heapq.heappop(bucket)
+            self.current_bucket += 1
+        return None
+
+
+def make_frontier(problem, root_node, sort_by='g', h_fun=None):
+    """Return a frontier for searching the given problem, sorted by the
+    specified cost metric (g or f). A BucketFrontier is used when node
+    values can be bounded in advance, using the largest road segment cost,
+    the search depth limit, and the largest heuristic value (h_max, as
+    provided by HeuristicFunction). Buckets are as wide as the smallest
+    road segment cost, but widened if needed to keep their number within
+    max_buckets. Otherwise, a heap-based Frontier is used. The search
+    functions use a plain Frontier by default, as on small maps the buckets
+    cost more to set up than they save."""
+    compiled = problem.compiled
+    if compiled.min_cost is None or compiled.min_cost <= 0.0:
+        return Frontier(root_node, sort_by)
+    f_max = compiled.max_cost * depth_limit
+    if h_fun is not None:
+        h_max = getattr(h_fun, 'h_max', None)
+        if h_max is None:
+            return Frontier(root_node, sort_by)
+        f_max += h_max
+    if not math.isfinite(f_max):
+        return Frontier(root_node, sort_by)
+    width = max(compiled.min_cost, f_max / max_buckets)
+    return BucketFrontier(root_node, sort_by, 0.0, f_max, width)
@@ -12,7 +12,9 @@
 # Psalm Bautista 10/18/2023
 
 
+import vars
 from route import Node
+from route import SearchContext
 from route import Frontier
 
 
@@ -27,20 +29,27 @@ def uniform_cost_search(problem, repeat_check=False):
     if problem.is_goal(node.loc):
         return node
     frontier = Frontier(node)
-    reachedNodes = [node]
-    while not frontier.is_empty():
-        node = frontier.pop()
-        if problem.is_goal(node.loc):
-            return node
-        for child in node.expand(problem):
-            if repeat_check:
-                if child in reachedNodes:
-                    if frontier.contains(child) and frontier[child] > frontier.__getitem__(child):
-                        frontier.__delitem__(child)
+    best_cost = {node.loc: frontier.key(node)}
+    ctx = SearchContext()
+    try:
+        while not frontier.is_empty():
+            node = frontier.pop()
+            if problem.is_goal(node.loc):
+                return node
+            for child in node.expand(problem, None, ctx):
+                if repeat_check:
+                    value = frontier.key(child)
+                    if child.loc in best_cost:
+                        if (value < best_cost[child.loc]
+                                and frontier.contains(child)):
+                            del frontier[child]
+                            frontier.add(child)
+                            best_cost[child.loc] = value
+                    else:
                         frontier.add(child)
+                        best_cost[child.loc] = value
                 else:
                     frontier.add(child)
-                    reachedNodes.append(child)
-            else:
-                frontier.add(child)
-    return None
+        return None
+    finally:
+        vars.node_expansion_count += ctx.expansions